@@ -2,7 +2,20 @@ import os
 import re
 import time
 import csv
-from datetime import datetime
+import json
+import random
+import sys
+import shelve
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import NamedTuple
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from googleapiclient.discovery import build
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
@@ -10,24 +23,75 @@ from spotipy.cache_handler import CacheFileHandler
 from dotenv import load_dotenv
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
+try:
+    import orjson  # Optional: much faster decoding of search responses
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    stream=sys.stdout
+)
+# Client libraries log every request/response at DEBUG; keep only their problems
+logging.getLogger("googleapiclient.discovery_cache").setLevel(logging.ERROR)
+logging.getLogger("urllib3").setLevel(logging.WARNING)
+logging.getLogger("spotipy").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
 
 load_dotenv() # get keys
 yt_api = os.getenv("YOUTUBE_API_KEY")
 sp_client_id = os.getenv("SPOTIFY_CLIENT_ID")
 sp_client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
 CACHE_PATH = ".cache"  # Custom cache file path
+HTTP_POOL_SIZE = 20  # Keep-alive connections per host, above MAX_CONCURRENT_SEARCHES
+HTTP_TIMEOUT = 30  # Seconds
 
 
-def log(message, level="INFO"):
-    """Prints formatted log messages with timestamps and log levels."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] [{level}] {message}")
+def build_http_session():
+    """
+    Returns a requests session with pooled keep-alive connections and retries on transient server errors.
+    429s are not retried here; they reach call_with_backoff with their Retry-After header.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        respect_retry_after_header=False,  # Otherwise urllib3 retries any 429 that carries Retry-After
+        # Default allowed_methods: only idempotent requests are retried, so a playlist add (POST)
+        # that reached Spotify is never replayed into duplicate tracks
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by the Spotify auth manager and client so TLS connections are reused
+http_session = build_http_session()
+
+
+STATUS_FLUSH_EVERY = 25  # Match status lines written per stdout write
+_status_lines = deque()
+
 
 def log_match_status(idx, total, title, found):
-    """Prints a clean status message for each track"""
+    """Queues a clean status message for each track, writing them out in batches"""
     status = "✅" if found else "❌"
-    print(f"[{idx}/{total}] {status} {title[:50]}{'...' if len(title) > 50 else ''}")
+    _status_lines.append(f"[{idx}/{total}] {status} {title[:50]}{'...' if len(title) > 50 else ''}")
+    if len(_status_lines) >= STATUS_FLUSH_EVERY:
+        flush_match_status()
+
+
+def flush_match_status():
+    """Writes any queued match status lines to stdout in one call"""
+    if _status_lines:
+        sys.stdout.write("\n".join(_status_lines) + "\n")
+        sys.stdout.flush()
+        _status_lines.clear()
+
 
 def get_spotify_client():
     """
@@ -48,17 +112,18 @@ def get_spotify_client():
             redirect_uri="http://localhost:8888/callback",
             scope="playlist-modify-public playlist-modify-private",
             cache_handler=cache_handler,
-            open_browser=False
+            open_browser=False,
+            requests_session=http_session
         )
 
         # Try to get cached token
         cached_token = auth_manager.get_cached_token()
         if cached_token and not auth_manager.is_token_expired(cached_token):
-            log("Using cached Spotify credentials")
-            return spotipy.Spotify(auth_manager=auth_manager)
+            logger.info("Using cached Spotify credentials")
+            return spotipy.Spotify(auth_manager=auth_manager, requests_session=http_session, requests_timeout=HTTP_TIMEOUT)
 
         # Manual auth flow
-        log("Valid cached credentials not found", "WARNING")
+        logger.warning("Valid cached credentials not found")
         print("\n" + "=" * 50)
         print(" SPOTIFY AUTHENTICATION REQUIRED ".center(50, "="))
         print("=" * 50)
@@ -75,20 +140,34 @@ def get_spotify_client():
         # Get new token
         code = response.split("code=")[1].split("&")[0]
         token = auth_manager.get_access_token(code)
-        log("New Spotify authentication successful")
-        return spotipy.Spotify(auth_manager=auth_manager)
+        logger.info("New Spotify authentication successful")
+        return spotipy.Spotify(auth_manager=auth_manager, requests_session=http_session, requests_timeout=HTTP_TIMEOUT)
 
     except Exception as e:
-        log(f"Spotify authentication failed: {str(e)}", "ERROR")
+        logger.error(f"Spotify authentication failed: {str(e)}")
         raise
 
 
+YOUTUBE_RETRIES = 5
+# Only request the snippet fields we read, to shrink each page
+PLAYLIST_ITEM_FIELDS = "items(snippet(title,resourceId/videoId,videoOwnerChannelTitle)),nextPageToken"
+
+
+class Video(NamedTuple):
+    """A YouTube playlist entry; field order matches youtube_tracks.csv"""
+    position: int
+    title: str
+    channel: str
+    video_id: str
+    url: str
+
+
 def get_youtube_playlist_items(playlist_id):
-    youtube = build("youtube", "v3", developerKey=yt_api)
+    youtube = build("youtube", "v3", developerKey=yt_api, http=httplib2.Http(timeout=HTTP_TIMEOUT))
     videos = []
     next_page_token = None
 
-    log(f"Fetching YouTube playlist {playlist_id}...")
+    logger.info(f"Fetching YouTube playlist {playlist_id}...")
 
     while True:
         try:
@@ -96,94 +175,155 @@ def get_youtube_playlist_items(playlist_id):
                 part="snippet",
                 playlistId=playlist_id,
                 maxResults=50,
-                pageToken=next_page_token
+                pageToken=next_page_token,
+                fields=PLAYLIST_ITEM_FIELDS
             )
-            response = request.execute()
+            # Retries 429/5xx responses with randomized exponential backoff
+            response = request.execute(num_retries=YOUTUBE_RETRIES)
 
-            for item in response["items"]:
+            items = response.get("items", [])
+            for item in items:
                 try:
-                    video_data = {
-                        "title": item["snippet"]["title"],
-                        "video_id": item["snippet"]["resourceId"]["videoId"],
-                        "url": f"https://youtu.be/{item['snippet']['resourceId']['videoId']}",
-                        "channel": item["snippet"].get("videoOwnerChannelTitle", "Unknown Channel"),
-                        "position": len(videos) + 1
-                    }
-                    videos.append(video_data)
+                    snippet = item["snippet"]
+                    video_id = snippet["resourceId"]["videoId"]
+                    videos.append(Video(
+                        position=len(videos) + 1,
+                        title=snippet["title"],
+                        channel=snippet.get("videoOwnerChannelTitle", "Unknown Channel"),
+                        video_id=video_id,
+                        url=f"https://youtu.be/{video_id}"
+                    ))
                 except KeyError as e:
-                    log(f"Skipping malformed video item (missing field: {str(e)})", "WARNING")
+                    logger.warning(f"Skipping malformed video item (missing field: {str(e)})")
                     continue
 
-            log(f"Fetched {len(response['items'])} items (Total: {len(videos)})")
+            logger.info(f"Fetched {len(items)} items (Total: {len(videos)})")
 
             next_page_token = response.get("nextPageToken")
             if not next_page_token:
                 break
 
-            time.sleep(1)  # Avoid API quota limits
-
         except Exception as e:
-            log(f"YouTube API Error: {str(e)}", "ERROR")
+            logger.error(f"YouTube API Error: {str(e)}")
             break
 
     return videos
 
 
+CSV_BUFFER_SIZE = 1 << 20  # Coalesce row writes into 1 MiB chunks
+
+
 def export_to_csv(videos, filename="youtube_tracks.csv"):
     """Exports YouTube playlist data to CSV."""
     try:
-        with open(filename, "w", newline="", encoding="utf-8") as csvfile:
-            fieldnames = ["position", "title", "channel", "video_id", "url"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
+        with open(filename, "w", newline="", encoding="utf-8", buffering=CSV_BUFFER_SIZE) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(Video._fields)
             writer.writerows(videos)
-        log(f"Exported {len(videos)} tracks to {filename}")
+        logger.info(f"Exported {len(videos)} tracks to {filename}")
     except Exception as e:
-        log(f"CSV Export Error: {str(e)}", "ERROR")
-
-
+        logger.error(f"CSV Export Error: {str(e)}")
+
+
+# --- Title Parsing ---
+# Whole words removed from anywhere in a title; video/audio labels are handled by _CLEAN_TAIL
+UNWANTED_KEYWORDS = ['topic', 'visualizer', 'mv']
+
+TITLE_CACHE_SIZE = 8192  # Parsed titles kept in memory
+
+# Compiled once at import; these run for every track
+# A single trailing label; clean_title strips these repeatedly for "Official Music Video HD"
+_CLEAN_TAIL = re.compile(
+    r'\s*\b(?:official\s*(?:video|audio|lyric video|music video)?|lyric video|music video|lyrics?|hd|4k|mv|visualizer)\s*$',
+    re.IGNORECASE
+)
+_CHANNEL_SUFFIX = re.compile(r'\s*-\s*(vevo|topic)\s*$', re.IGNORECASE)
+_QUOTE_TABLE = str.maketrans("", "", "\"'")
+_UNWANTED = re.compile(r"\b(" + "|".join(UNWANTED_KEYWORDS) + r")\b", re.IGNORECASE)
+
+# Special cases, matched case-insensitively without lowercasing the title
+_MIX_KEYWORDS = re.compile(r"math rock|midwest emo|mix|playlist", re.IGNORECASE)
+_ALBUM_KEYWORDS = re.compile(r"full album|full ep|\[full\]", re.IGNORECASE)
+_COVER_ARTIST = re.compile(r'\((.*?)\s*cover\)', re.IGNORECASE)
+_COVER_SUFFIX = re.compile(r'\s*\(.*?cover\)')
+
+# Characters that can separate artist from track; titles without any are searched as a track only
+ARTIST_TRACK_DELIMITERS = frozenset("-–—:|~“")
+
+# Common "Artist - Track" form, tried before the specialized patterns below
+_ARTIST_TRACK = re.compile(r"^(?P<artist>.*?)\s*[-–—:|~]\s*(?P<track>[^(\[{]+)")
+
+_ARTIST_TRACK_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in [
+    r"^(.*?)\s*[-:|~]\s*(.*?)(?:\s+\(.*\))?$",  # "Artist - Track (Official Video)"
+    r"^(.*?)\s*[-:|~]\s*(.*?)(?:\s+\[.*\])?$",  # "Artist - Track [2023]"
+    r"^(.*?)\s*[-:|~]\s*(.*?)(?:\s+ft\..*)?$",  # "Artist - Track ft. Someone"
+    r"^(.*?)\s*[-:|~]\s*(.*)$",  # Fallback for simple splits
+    r"^(.*?)[\s\-–—:|]+(.*?)$",  # Artist - Title
+    r"^(.*?)\s*[\"“](.*?)[\"”]",  # Artist "Title"
+    r"^(.*?)\s+-\s+(.*?)$",  # Artist - Title (strict hyphen)
+    # Common patterns with featured artists
+    r"^(.*?)\s*[-–~|]\s*([^\(\[\{]+?)\s*(?:\(ft\.\s*(.*?)\)|ft\.\s*(.*?))(?:\s*[\(\[]|\s*$)",
+    # Standard "Artist - Title" format
+    r"^(.*?)\s*[-–~|]\s*([^\(\[\{]+)",
+    # "Artist: Title" format
+    r"^(.*?)\s*:\s*([^\(\[\{]+)",
+    # "Artist "Title"" format
+    r'^(.*?)\s*["“](.+?)["”]',
+    # Live/performance indicators
+    r"^(.*?)\s*[-–~|]\s*(.*?)\s*(?:\(live[^\)]*\)|\[live[^\]]*\])",
+    # Cover versions
+    r"^(.*?)\s*[-–~|]\s*(.*?)\s*(?:\(cover[^\)]*\)|\[cover[^\]]*\])",
+    # Remixes
+    r"^(.*?)\s*[-–~|]\s*(.*?)\s*(?:\(.*?remix\)|\[.*?remix\])",
+    # Fallback - split on last hyphen if nothing else matches
+    r"^(.*)\s*[-–]\s*(.*)$"
+])
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
 def clean_title(title):
     """
     Clean the title string by:
       - Removing text in parentheses or brackets
       - Removing common unwanted keywords
     """
-    # Remove common keywords (case insensitive)
-    unwanted = [
-        'official video', 'official audio', 'lyric video',
-        'lyrics', 'hd', '4k', 'topic', 'visualizer',
-        'music video', 'official music video', 'mv'
-    ]
-    # Remove these only when they appear at the end
-    title = re.sub(
-        r'(?i)\s*(official\s*(video|audio|lyric video|music video)?|lyrics?|hd|4k|mv|visualizer)\s*$',
-        '',
-        title
-    )
+    # Drop text in parentheses or brackets by scanning between bracket positions
+    if "(" in title or "[" in title:
+        parts = []
+        start = 0
+        while True:
+            opens = [p for p in (title.find("(", start), title.find("[", start)) if p != -1]
+            if not opens:
+                break
+            open_at = min(opens)
+            closes = [p for p in (title.find(")", open_at), title.find("]", open_at)) if p != -1]
+            if not closes:
+                break  # Unclosed bracket is kept as text
+            parts.append(title[start:open_at])
+            start = min(closes) + 1
+        parts.append(title[start:])
+        title = "".join(parts)
+
+    # Remove all single and double quotes
+    title = title.translate(_QUOTE_TABLE)
+
+    # Remove these only when they appear at the end (checked after brackets so "... Official Video [HD]" is caught),
+    # one label at a time; a repeated group in the regex would backtrack exponentially on runs of labels
+    stripped = _CLEAN_TAIL.sub('', title)
+    while stripped != title:
+        title, stripped = stripped, _CLEAN_TAIL.sub('', stripped)
 
     # Remove common channel suffixes
-    title = re.sub(r'(?i)\s*-\s*(vevo|topic)\s*$', '', title)
+    title = _CHANNEL_SUFFIX.sub('', title)
 
-    # Remove text in parentheses or brackets
-    title = re.sub(r"[\"']", "", title)  # Remove all single and double quotes
-    title = re.sub(r"\s+", " ", title).strip()  # Remove extra spaces
-    title = re.sub(r"[\(\[].*?[\)\]]", "", title)
-
-    # Clean up remaining artifacts
-    title = re.sub(r'\s+', ' ', title).strip()
-    title = title.strip(' -:|~')
-
-
-    pattern = re.compile("|".join(unwanted), re.IGNORECASE)
-    title = pattern.sub("", title)
-
-    # Remove extra spaces and common delimiters at the ends
-    title = title.strip(" -:|~")
-    title = re.sub(r"\s{2,}", " ", title)
+    # Remove common keywords (case insensitive)
+    title = _UNWANTED.sub("", title)
 
-    return title.strip()
+    # Collapse whitespace and strip common delimiters at the ends
+    return " ".join(title.split()).strip(" -:|~")
 
 
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
 def handle_special_cases(title):
     """
     Handle known problematic patterns from the unmatched_tracks.csv
@@ -196,60 +336,46 @@ def handle_special_cases(title):
             * Time stamps in the video that might have the track name in it
     """
     # Math rock/emo mixes
-    if any(x in title.lower() for x in ['math rock', 'midwest emo', 'mix', 'playlist']):
+    if _MIX_KEYWORDS.search(title):
         return None, title.split('|')[0].strip()
 
     # Full album/EP cases
-    if any(x in title.lower() for x in ['full album', 'full ep', '[full]']):
+    if _ALBUM_KEYWORDS.search(title):
         return None, title.split('[')[0].strip()
 
     # Covers with original artist mentioned
-    cover_match = re.search(r'\((.*?)\s*cover\)', title, re.IGNORECASE)
+    cover_match = _COVER_ARTIST.search(title)
     if cover_match:
         original_artist = cover_match.group(1)
-        track = re.sub(r'\s*\(.*?cover\)', '', title)
+        track = _COVER_SUFFIX.sub('', title)
         return original_artist, track
 
     return None, None
 
 
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
 def extract_artist_track(title):
     """Extracts artist and track using multiple patterns with priority."""
-    artist, track = handle_special_casese(title)
+    artist, track = handle_special_cases(title)
     if artist is not None:
         return artist, track
 
     original_title = title
     title = clean_title(title)
 
-    patterns = [
-        r"^(.*?)\s*[-:|~]\s*(.*?)(?:\s+\(.*\))?$",  # "Artist - Track (Official Video)"
-        r"^(.*?)\s*[-:|~]\s*(.*?)(?:\s+\[.*\])?$",  # "Artist - Track [2023]"
-        r"^(.*?)\s*[-:|~]\s*(.*?)(?:\s+ft\..*)?$",  # "Artist - Track ft. Someone"
-        r"^(.*?)\s*[-:|~]\s*(.*)$",  # Fallback for simple splits
-        r"^(.*?)[\s\-–—:|]+(.*?)$",  # Artist - Title
-        r"^(.*?)\s*[\"“](.*?)[\"”]",  # Artist "Title"
-        r"^(.*?)\s+-\s+(.*?)$",  # Artist - Title (strict hyphen)
-        # Common patterns with featured artists
-        r"^(.*?)\s*[-–~|]\s*([^\(\[\{]+?)\s*(?:\(ft\.\s*(.*?)\)|ft\.\s*(.*?))(?:\s*[\(\[]|\s*$)",
-        # Standard "Artist - Title" format
-        r"^(.*?)\s*[-–~|]\s*([^\(\[\{]+)",
-        # "Artist: Title" format
-        r"^(.*?)\s*:\s*([^\(\[\{]+)",
-        # "Artist "Title"" format
-        r'^(.*?)\s*["“](.+?)["”]',
-        # Live/performance indicators
-        r"^(.*?)\s*[-–~|]\s*(.*?)\s*(?:\(live[^\)]*\)|\[live[^\]]*\])",
-        # Cover versions
-        r"^(.*?)\s*[-–~|]\s*(.*?)\s*(?:\(cover[^\)]*\)|\[cover[^\]]*\])",
-        # Remixes
-        r"^(.*?)\s*[-–~|]\s*(.*?)\s*(?:\(.*?remix\)|\[.*?remix\])",
-        # Fallback - split on last hyphen if nothing else matches
-        r"^(.*)\s*[-–]\s*(.*)$"
-    ]
+    # No delimiter means there is nothing to split on
+    if ARTIST_TRACK_DELIMITERS.isdisjoint(title):
+        return None, title
 
-    for pattern in patterns:
-        match = re.match(pattern, title, re.IGNORECASE)
+    match = _ARTIST_TRACK.match(title)
+    if match:
+        artist = match.group("artist").strip()
+        track = match.group("track").strip()
+        if artist and track:
+            return artist, track
+
+    for pattern in _ARTIST_TRACK_PATTERNS:
+        match = pattern.match(title)
         if match:
             artist = match.group(1).strip()
             track = match.group(2).strip()
@@ -268,16 +394,24 @@ def extract_artist_track(title):
     return None, title  # Fallback if no pattern matches
 
 
+_ARTIST_SUFFIX = re.compile(r'(\s*-\s*topic|\s*vevo|\s*official)$', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def clean_artist(artist):
+    """Remove common channel suffixes from artist names"""
+    return _ARTIST_SUFFIX.sub('', artist)
+
+
 def build_spotify_query(artist, track):
     """
     Build optimized Spotify search queries based on artist/track info
     """
     # If no artist, just search track
     if not artist or artist.lower() == 'various artists':
-        return f"track:{track}"
+        return [f"track:{track}", track]
 
-    # Remove common suffixes from artist names
-    artist_clean = re.sub(r'(\s*-\s*topic|\s*vevo|\s*official)$', '', artist, flags=re.IGNORECASE)
+    artist_clean = clean_artist(artist)
 
     # Try different query formats
     queries = [
@@ -290,64 +424,264 @@ def build_spotify_query(artist, track):
 
 
 # --- Spotify Matching ---
-def match_to_spotify(video_data, sp_client):
-    """Modified to accept an existing Spotify client"""
-    results = []
-    matched = 0
-    unmatched_titles = []  # Track failed matches
+MAX_CONCURRENT_SEARCHES = 10  # In-flight Spotify searches
+SEARCH_INTERVAL = 0.1  # Minimum seconds between search requests (shared by all workers)
+MAX_RETRIES = 5
+CONFIDENT_MATCH_SCORE = 80  # Minimum score to accept a result; higher-scoring hits skip the broader queries
+SPOTIFY_SEARCH_URL = "https://api.spotify.com/v1/search"
+TOKEN_REFRESH_MARGIN = 60  # Seconds before expiry to re-read the Spotify access token (spotipy refreshes it)
+_token_state = {"access_token": None, "expires_at": 0}
+_token_lock = threading.Lock()
+QUERY_CACHE_PATH = "spotify_query.cache"  # Search results reused between runs
+
+
+class RateLimiter:
+    """Spaces calls at least `interval` seconds apart across threads."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def call_with_backoff(func, *args, **kwargs):
+    """
+    Calls a Spotify API function, retrying rate limited (429) responses.
+    Honours Retry-After when Spotify sends it, otherwise backs off exponentially with jitter.
+    Server errors are left to the shared session, which only retries idempotent requests.
+    """
+    for attempt in range(MAX_RETRIES):
+        try:
+            return func(*args, **kwargs)
+        except spotipy.SpotifyException as e:
+            if e.http_status != 429 or attempt == MAX_RETRIES - 1:
+                raise
+            retry_after = (e.headers or {}).get("Retry-After")
+            delay = float(retry_after) if retry_after else min(30, 2 ** attempt) + random.random()
+            logger.warning(f"Spotify returned {e.http_status}, retrying in {delay:.1f}s")
+            time.sleep(delay)
 
-    log("Starting Spotify matching...")
-    print("\n=== TRACK MATCHING RESULTS ===")
 
-    for idx, item in enumerate(video_data, 1):
-        try:
-            title = item["title"]
-            artist, track = extract_artist_track(title)
-            queries = build_spotify_query(artist, track)
-            # query = f"artist:{artist} track:{track}" if artist else f"track:{track}"
-
-            # Try each query in order until we get a match
-            for query in queries:
-                result = sp_client.search(q=query, type="track", limit=5)  # Get top 5 results
-
-                if result['tracks']['items']:
-                    # Additional validation could go here
-                    best_match = result['tracks']['items'][0]
-                    item['spotify_uri'] = best_match['uri']
-                    item['query_used'] = query
-                    break
-            # result = sp_client.search(q=query, type="track", limit=1)
-            time.sleep(0.5)  # Rate limiting
+def similarity(a, b):
+    """
+    Token-set similarity (0-100) between two strings, ignoring case, word order and extra words on
+    either side (e.g. "feat." credits or a missing artist).
+    """
+    tokens_a, tokens_b = set(a.lower().split()), set(b.lower().split())
+    common = " ".join(sorted(tokens_a & tokens_b))
+    with_a = f"{common} {' '.join(sorted(tokens_a - tokens_b))}".strip()
+    with_b = f"{common} {' '.join(sorted(tokens_b - tokens_a))}".strip()
+    return 100 * max(
+        SequenceMatcher(None, common, with_a).ratio() if common else 0,
+        SequenceMatcher(None, common, with_b).ratio() if common else 0,
+        SequenceMatcher(None, with_a, with_b).ratio()
+    )
+
+
+def get_bearer_token(auth_manager):
+    """
+    Returns the Spotify access token kept in memory, re-reading it TOKEN_REFRESH_MARGIN seconds before it
+    expires so long matching runs don't hit an expired token (or re-read the cache file) on every search.
+    """
+    with _token_lock:
+        if time.time() > _token_state["expires_at"] - TOKEN_REFRESH_MARGIN:
+            # validate_token refreshes tokens that are within 60 seconds of expiring
+            token_info = auth_manager.validate_token(auth_manager.cache_handler.get_cached_token())
+            if token_info is None:
+                # Nothing usable in the cache (e.g. it couldn't be written); let spotipy provide a token
+                # and check the cache again on the next search
+                return auth_manager.get_access_token(as_dict=False)
+            _token_state["access_token"] = token_info["access_token"]
+            _token_state["expires_at"] = token_info["expires_at"]
+        return _token_state["access_token"]
+
+
+def search_tracks(sp_client, query, limit=5):
+    """
+    Searches Spotify tracks directly through the shared HTTP session instead of spotipy's request wrapper.
+    spotipy still supplies the access token; error responses raise SpotifyException like spotipy does.
+    """
+    token = get_bearer_token(sp_client.auth_manager)
+    response = http_session.get(
+        SPOTIFY_SEARCH_URL,
+        params={"q": query, "type": "track", "limit": limit},
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=HTTP_TIMEOUT
+    )
+    if response.status_code != 200:
+        raise spotipy.SpotifyException(
+            response.status_code, -1, f"{response.url}:\n {response.text}", headers=response.headers
+        )
+    return json_loads(response.content)
 
-            spotify_uri = result["tracks"]["items"][0]["uri"] if result["tracks"]["items"] else None
-            found = spotify_uri is not None
 
-            # Simple status logging
-            log_match_status(idx, len(video_data), title, found)
+def match_score(artist, track, candidate):
+    """Scores how well a Spotify track result fits the parsed artist/track (0-100)"""
+    wanted = f"{artist} {track}" if artist else track
+    return similarity(wanted, f"{candidate['artists'][0]['name']} {candidate['name']}")
 
-            if found:
-                matched += 1
-            else:
-                unmatched_titles.append(title)
 
-            results.append({
-                **item,
-                "spotify_uri": spotify_uri,
-                "spotify_url": f"https://open.spotify.com/track/{spotify_uri.split(':')[-1]}" if spotify_uri else None,
-                "match_status": "✅" if spotify_uri else "❌",
-                "query_used": query
-            })
+class QueryCache:
+    """
+    Persistent (artist, track) -> (spotify_uri, query, score) cache of confident matches, shared across runs.
+    Only use it from the thread that opened it: from Python 3.13 shelve is backed by sqlite3,
+    which rejects access from other threads.
+    """
 
-        except Exception as e:
-            log_match_status(idx, len(video_data), title, False)
-            unmatched_titles.append(title)
-            results.append({
-                **item,
-                "spotify_uri": None,
-                "spotify_url": None,
-                "match_status": f"⚠️ ({str(e)})",
-                "query_used": query if 'query' in locals() else "N/A"
-            })
+    def __init__(self, path=QUERY_CACHE_PATH):
+        self._shelf = shelve.open(path)
+
+    @staticmethod
+    def key(artist, track):
+        # Same artist normalization as the search queries, so "Artist - Topic" and "Artist" share entries
+        return f"{clean_artist(artist or '').lower()}|{track.lower()}"
+
+    def get(self, artist, track):
+        cached = self._shelf.get(self.key(artist, track))
+        # Entries without a score predate the confidence gate and may be weak guesses
+        return cached if cached and len(cached) == 3 else None
+
+    def set(self, artist, track, spotify_uri, query, score):
+        self._shelf[self.key(artist, track)] = (spotify_uri, query, score)
+
+    def close(self):
+        self._shelf.close()
+
+
+def spotify_track_url(uri):
+    return f"https://open.spotify.com/track/{uri.split(':')[-1]}"
+
+
+def match_result(spotify_uri, query, score, best_guess_uri=None):
+    """
+    Builds the match fields of a result row (merged with the YouTube Video's fields by match_to_spotify).
+    Only results scoring CONFIDENT_MATCH_SCORE or more count as matches; the best weaker result is kept
+    as `best_guess_url` so it can be reviewed in unmatched_tracks.csv.
+    """
+    if spotify_uri:
+        status = "✅"
+    elif best_guess_uri:
+        status = f"❌ (best guess scored {round(score)})"
+    else:
+        status = "❌"
+    return {
+        "spotify_uri": spotify_uri,
+        "spotify_url": spotify_track_url(spotify_uri) if spotify_uri else None,
+        "match_status": status,
+        "match_score": round(score) if spotify_uri or best_guess_uri else None,
+        "best_guess_url": spotify_track_url(best_guess_uri) if best_guess_uri else None,
+        "query_used": query
+    }
+
+
+def match_track(artist, track, sp_client, limiter):
+    """Searches Spotify for a parsed artist/track and returns its match fields"""
+    try:
+        queries = build_spotify_query(artist, track)
+        best_guess = None  # Best low-confidence (score, uri, query), reported if no query is confident
+
+        # Queries go from strict to broad; stop at the first confident hit
+        for query in queries:
+            limiter.wait()
+            result = call_with_backoff(search_tracks, sp_client, query, limit=5)  # Get top 5 results
+
+            candidates = result['tracks']['items']
+            if candidates:
+                score, best_match = max(
+                    ((match_score(artist, track, candidate), candidate) for candidate in candidates),
+                    key=lambda scored: scored[0]
+                )
+                if score >= CONFIDENT_MATCH_SCORE:
+                    return match_result(best_match['uri'], query, score)
+                if best_guess is None or score > best_guess[0]:
+                    best_guess = (score, best_match['uri'], query)
+
+        if best_guess:
+            score, best_guess_uri, query = best_guess
+            return match_result(None, query, score, best_guess_uri)
+        return match_result(None, query, 0)
+
+    except Exception as e:
+        return {
+            "spotify_uri": None,
+            "spotify_url": None,
+            "match_status": f"⚠️ ({str(e)})",
+            "match_score": None,
+            "best_guess_url": None,
+            "query_used": query if 'query' in locals() else "N/A"
+        }
+
+
+def match_to_spotify(video_data, sp_client, max_workers=MAX_CONCURRENT_SEARCHES):
+    """
+    Matches YouTube items to Spotify tracks, running up to `max_workers` searches at once.
+    Items that parse to the same artist/track share one search. Results keep the order of `video_data`.
+    """
+    matched = 0
+    unmatched_titles = []  # Track failed matches
+    limiter = RateLimiter(SEARCH_INTERVAL)
+    cache = QueryCache()
+
+    logger.info("Starting Spotify matching...")
+    print("\n=== TRACK MATCHING RESULTS ===")
+
+    # Group items by cache key so duplicates within the playlist are only searched once
+    groups = {}  # cache key -> (artist, track, [items])
+    item_keys = []
+    for item in video_data:
+        artist, track = extract_artist_track(item.title)
+        key = QueryCache.key(artist, track)
+        groups.setdefault(key, (artist, track, []))[2].append(item)
+        item_keys.append(key)
+
+    # The cache is only read and written on this thread; workers just search
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}  # Future -> cache key
+            searched = set()
+            for key, (artist, track, _) in groups.items():
+                cached = cache.get(artist, track)
+                if cached:
+                    future = Future()
+                    future.set_result(match_result(*cached))
+                else:
+                    future = executor.submit(match_track, artist, track, sp_client, limiter)
+                    searched.add(future)
+                futures[future] = key
+
+            # Report progress as searches finish
+            idx = 0
+            for future in as_completed(futures):
+                match = future.result()
+                key = futures[future]
+                artist, track, items = groups[key]
+                found = match["spotify_uri"] is not None
+
+                if found and future in searched and match["match_score"] >= CONFIDENT_MATCH_SCORE:
+                    cache.set(artist, track, match["spotify_uri"], match["query_used"], match["match_score"])
+
+                for item in items:
+                    idx += 1
+                    # Simple status logging
+                    log_match_status(idx, len(video_data), item.title, found)
+                    if found:
+                        matched += 1
+                    else:
+                        unmatched_titles.append(item.title)
+    finally:
+        cache.close()
+        flush_match_status()
+
+    matches = {key: future.result() for future, key in futures.items()}
+    results = [{**item._asdict(), **matches[key]} for item, key in zip(video_data, item_keys)]
 
     # Print summary after matching completes
     print("\n=== MATCHING SUMMARY ===")
@@ -362,6 +696,16 @@ def match_to_spotify(video_data, sp_client):
     return results, matched
 
 
+# (keyword, category) pairs checked in order; "remix" must come before "mix"
+UNMATCHED_CATEGORIES = (
+    ('cover', 'covers'),
+    ('remix', 'remixes'),
+    ('live', 'live'),
+    ('instrumental', 'instrumental'),
+    ('mix', 'mixes'),
+)
+
+
 def analyze_unmatched_patterns(unmatched_csv):
     """
     Analyze the unmatched_tracks.csv to identify common patterns
@@ -375,65 +719,59 @@ def analyze_unmatched_patterns(unmatched_csv):
         'mixes': []
     }
 
-    with open(unmatched_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    with open(unmatched_csv, 'r', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return patterns
+
+        title_col = header.index('title')
+        # Only the title column is needed, so skip building a dict per row
         for row in reader:
-            title = row['title']
-
-            if 'cover' in title.lower():
-                patterns['covers'].append(title)
-            elif 'remix' in title.lower():
-                patterns['remixes'].append(title)
-            elif 'live' in title.lower():
-                patterns['live'].append(title)
-            elif 'instrumental' in title.lower():
-                patterns['instrumental'].append(title)
-            elif 'mix' in title.lower():
-                patterns['mixes'].append(title)
+            if not row:
+                continue  # Blank line (DictReader skipped these too)
+            title = row[title_col]
+            lowered = title.lower()
+
+            # First matching keyword wins, in priority order
+            for keyword, category in UNMATCHED_CATEGORIES:
+                if keyword in lowered:
+                    patterns[category].append(title)
+                    break
 
     return patterns
 
 
-def export_matched_to_csv(matched_data, filename="matched_tracks.csv"):
-    """Exports successfully matched tracks to CSV"""
+def export_results(matched_data, matched_filename="matched_tracks.csv", unmatched_filename="unmatched_tracks.csv"):
+    """Exports successful and failed matches to their CSVs in a single pass"""
     try:
-        with open(filename, "w", newline="", encoding="utf-8") as csvfile:
-            fieldnames = ["position", "title", "channel", "spotify_url", "query_used"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for item in matched_data:
-                if item["spotify_uri"]:  # Only export successful matches
-                    writer.writerow({
-                        "position": item["position"],
-                        "title": item["title"],
-                        "channel": item["channel"],
-                        "spotify_url": item["spotify_url"],
-                        "query_used": item["query_used"]
-                    })
-        log(f"Exported {len([x for x in matched_data if x['spotify_uri']])} matched tracks to {filename}")
-    except Exception as e:
-        log(f"Matched CSV Export Error: {str(e)}", "ERROR")
-
+        with open(matched_filename, "w", newline="", encoding="utf-8", buffering=CSV_BUFFER_SIZE) as matched_file, \
+                open(unmatched_filename, "w", newline="", encoding="utf-8", buffering=CSV_BUFFER_SIZE) as unmatched_file:
+            matched_writer = csv.writer(matched_file)
+            unmatched_writer = csv.writer(unmatched_file)
+            matched_writer.writerow(["position", "title", "channel", "spotify_url", "query_used", "match_score"])
+            unmatched_writer.writerow(
+                ["position", "title", "channel", "youtube_url", "query_used", "best_guess_url", "match_score"]
+            )
 
-def export_unmatched_to_csv(unmatched_data, filename="unmatched_tracks.csv"):
-    """Exports failed matches to CSV"""
-    try:
-        with open(filename, "w", newline="", encoding="utf-8") as csvfile:
-            fieldnames = ["position", "title", "channel", "youtube_url", "query_used"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for item in unmatched_data:
-                if not item["spotify_uri"]:  # Only export failures
-                    writer.writerow({
-                        "position": item["position"],
-                        "title": item["title"],
-                        "channel": item["channel"],
-                        "youtube_url": item["url"],
-                        "query_used": item["query_used"]
-                    })
-        log(f"Exported {len([x for x in unmatched_data if not x['spotify_uri']])} unmatched tracks to {filename}")
+            matched = unmatched = 0
+            for item in matched_data:
+                if item["spotify_uri"]:
+                    matched_writer.writerow(
+                        (item["position"], item["title"], item["channel"], item["spotify_url"], item["query_used"],
+                         item["match_score"])
+                    )
+                    matched += 1
+                else:
+                    unmatched_writer.writerow(
+                        (item["position"], item["title"], item["channel"], item["url"], item["query_used"],
+                         item["best_guess_url"], item["match_score"])
+                    )
+                    unmatched += 1
+        logger.info(f"Exported {matched} matched tracks to {matched_filename}")
+        logger.info(f"Exported {unmatched} unmatched tracks to {unmatched_filename}")
     except Exception as e:
-        log(f"Unmatched CSV Export Error: {str(e)}", "ERROR")
+        logger.error(f"Match results CSV Export Error: {str(e)}")
 
 
 def read_spotify_tracks_from_csv(csv_file):
@@ -465,11 +803,13 @@ def create_or_use_playlist(sp, playlist_name="Imported Playlist"):
 
 
 def add_tracks_to_playlist(sp, playlist_id, track_uris):
-    """Add tracks to the given Spotify playlist"""
+    """Add tracks to the given Spotify playlist, skipping duplicate URIs"""
+    unique_uris = list(dict.fromkeys(track_uris))  # Dedupe, keeping playlist order
     chunk_size = 100  # Spotify allows adding up to 100 tracks at a time
-    for i in range(0, len(track_uris), chunk_size):
-        sp.playlist_add_items(playlist_id, track_uris[i:i + chunk_size])
-    print(f"Added {len(track_uris)} tracks to playlist!")
+    # Chunks are sent in order; concurrent appends would shuffle the playlist
+    for i in range(0, len(unique_uris), chunk_size):
+        call_with_backoff(sp.playlist_add_items, playlist_id, unique_uris[i:i + chunk_size])
+    print(f"Added {len(unique_uris)} tracks to playlist!")
 
 
 # Press the green button in the gutter to run the script.
@@ -490,7 +830,7 @@ if __name__ == '__main__':
             track_uris = read_spotify_tracks_from_csv(matched_tracks)
 
             if not track_uris:
-                log("No valid Spotify track URLs found in the CSV.")
+                logger.info("No valid Spotify track URLs found in the CSV.")
                 exit()
 
             # Get or create a playlist
@@ -499,37 +839,36 @@ if __name__ == '__main__':
             # Add tracks
             add_tracks_to_playlist(sp, playlist["id"], track_uris)
 
-            log("Playlist update complete!")
+            logger.info("Playlist update complete!")
 
 
         else:
-            log("STEP 1: Fetching YouTube data...")
+            logger.info("STEP 1: Fetching YouTube data...")
             step = "Step 1"
             youtube_data = get_youtube_playlist_items(yt_playlist)
-            log(f"Retrieved {len(youtube_data)} YouTube tracks")
+            logger.info(f"Retrieved {len(youtube_data)} YouTube tracks")
 
-            log("STEP 2: Exporting to youtube_tracks.csv...")
+            logger.info("STEP 2: Exporting to youtube_tracks.csv...")
             step = "Step 2"
             export_to_csv(youtube_data)
-            log("CSV export completed")
+            logger.info("CSV export completed")
 
-            log("STEP 3: Authenticating with Spotify...")
+            logger.info("STEP 3: Authenticating with Spotify...")
             step = "Step 3"
             sp = get_spotify_client()
-            log("Spotify authentication successful")
+            logger.info("Spotify authentication successful")
 
-            log(f"STEP 4: Starting Spotify matching for {len(youtube_data)} tracks...")
+            logger.info(f"STEP 4: Starting Spotify matching for {len(youtube_data)} tracks...")
             step = "Step 4"
             matched_data, success_count = match_to_spotify(youtube_data, sp_client=sp)
-            log(f"Matching completed. Success: {success_count}/{len(youtube_data)}")
+            logger.info(f"Matching completed. Success: {success_count}/{len(youtube_data)}")
 
             # NEW: Export match results
-            log("Exporting match results to CSV...")
-            export_matched_to_csv(matched_data)
-            export_unmatched_to_csv(matched_data)  # Note: uses same data, filters differently
+            logger.info("Exporting match results to CSV...")
+            export_results(matched_data)
 
             # Continue with playlist operations
-            log("STEP 5: Starting playlist operations...")
+            logger.info("STEP 5: Starting playlist operations...")
             step = "Step 5"
             use_existing = input("Use existing playlist? (y/n): ").strip().lower()
             if use_existing == 'y':
@@ -544,14 +883,14 @@ if __name__ == '__main__':
                     public=True
                 )
 
-            log("STEP 6: Adding tracks to Spotify...")
+            logger.info("STEP 6: Adding tracks to Spotify...")
             matched_uris = [item["spotify_uri"] for item in matched_data if item["spotify_uri"]]
-            sp.playlist_add_items(playlist["id"], matched_uris)
+            add_tracks_to_playlist(sp, playlist["id"], matched_uris)
 
-            log(f"Matching completed.")
+            logger.info(f"Matching completed.")
 
     except Exception as e:
-        log(f"Script failed at step: {step}", "CRITICAL")
-        log(f"Error details: {str(e)}", "CRITICAL")
+        logger.critical(f"Script failed at step: {step}")
+        logger.critical(f"Error details: {str(e)}")
 
-    log(f"Execution time: {time.time() - start_time:.2f} seconds")
+    logger.info(f"Execution time: {time.time() - start_time:.2f} seconds")